@@ -1,19 +1,29 @@
-import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+from . import fastjson
 
 ALERTS_FILE = "alerts.json"
 ALERT_THRESHOLD = 7  # Congestion threshold for alert
 
+# filename -> (mtime_ns, parsed alerts); the file is re-read only when its mtime changes
+_alerts_cache: Dict[str, Tuple[int, List[Dict[str, Any]]]] = {}
+
 def load_alerts(filename: str = ALERTS_FILE) -> List[Dict[str, Any]]:
-    if not os.path.exists(filename):
+    try:
+        mtime = os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
         return []
-    with open(filename, 'r') as f:
-        return json.load(f)
+    cached = _alerts_cache.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(filename, 'rb') as f:
+            cached = (mtime, fastjson.loads(f.read()))
+        _alerts_cache[filename] = cached
+    return list(cached[1])  # Copy so callers can modify the list without touching the cache
 
 def save_alerts(alerts: List[Dict[str, Any]], filename: str = ALERTS_FILE):
-    with open(filename, 'w') as f:
-        json.dump(alerts, f)
+    _alerts_cache.pop(filename, None)
+    with open(filename, 'wb') as f:
+        f.write(fastjson.dumps(alerts))
 
 def add_alert(from_node: str, to_node: str, filename: str = ALERTS_FILE):
     alerts = load_alerts(filename)
@@ -37,10 +47,9 @@ def check_alerts(data: List[Dict[str, Any]], filename: str = ALERTS_FILE) -> Lis
     """
     Returns a list of alert messages for triggered alerts based on current traffic data.
     """
-    alerts = load_alerts(filename)
-    triggered = []
-    for alert in alerts:
-        for segment in data:
-            if segment["from"] == alert["from"] and segment["to"] == alert["to"] and segment["weight"] >= ALERT_THRESHOLD:
-                triggered.append(f"ALERT: Congestion on {alert['from']} -> {alert['to']} (weight: {segment['weight']})")
-    return triggered 
\ No newline at end of file
+    alert_set = {(a["from"], a["to"]) for a in load_alerts(filename)}
+    return [
+        f"ALERT: Congestion on {segment['from']} -> {segment['to']} (weight: {segment['weight']})"
+        for segment in data
+        if segment["weight"] >= ALERT_THRESHOLD and (segment["from"], segment["to"]) in alert_set
+    ]
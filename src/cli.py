@@ -2,12 +2,22 @@
 cli.py: Command-line interface for RouteIQ
 """
 import argparse
+import logging
+import sys
 from .traffic_api import fetch_traffic_data, build_graph_from_traffic
 from .congestion_map import find_hotspots, suggest_alternate_path
 from .graph import Graph
 import threading
 import time
 import timeit
+import numpy as np
+
+# --algorithm choice -> Graph method name
+ALGORITHMS = {
+    "dijkstra": "dijkstra",
+    "astar": "a_star",
+    "bidirectional": "bidirectional_dijkstra",
+}
 
 
 def poll_traffic(graph, city, min_lat=None, min_lon=None, max_lat=None, max_lon=None, interval=60):
@@ -17,16 +27,16 @@ def poll_traffic(graph, city, min_lat=None, min_lon=None, max_lat=None, max_lon=
     """
     while True:
         data = fetch_traffic_data(city, min_lat, min_lon, max_lat, max_lon)
-        # Update weights in the existing graph
-        for segment in data:
-            from_node = segment["from"]
-            to_node = segment["to"]
-            weight = segment["weight"]
-            # Update the edge if it exists
-            if from_node in graph.edges:
-                for i, (neighbor, _) in enumerate(graph.edges[from_node]):
-                    if neighbor == to_node:
-                        graph.edges[from_node][i] = (to_node, weight)
+        # Update weights in the existing graph with a single vectorized scatter
+        edge_index = graph.edge_index
+        idxs, ws = [], []
+        for s in data:
+            # Every parallel edge between the pair takes the new weight; unknown pairs are skipped
+            for e in edge_index.get((s["from"], s["to"]), ()):
+                idxs.append(e)
+                ws.append(s["weight"])
+        # One C-level scatter; path queries run in nogil kernels, so they are not blocked meanwhile
+        graph.weights[np.array(idxs, dtype=np.int64)] = np.array(ws, dtype=np.float32)
         time.sleep(interval)
 
 
@@ -38,6 +48,15 @@ def main():
     - Background traffic polling (multithreading)
     - Parallel pathfinding (multithreading)
     """
+    # Modules of this package report through logging (e.g. where the map was saved). Show their
+    # INFO messages on stdout as plain lines, like the rest of the CLI output, without turning on
+    # INFO output from third-party loggers.
+    package_log = logging.getLogger(__package__)
+    if not package_log.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        package_log.addHandler(handler)
+        package_log.setLevel(logging.INFO)
     parser = argparse.ArgumentParser(description="RouteIQ: Find the shortest, least-congested path in a city.")
     parser.add_argument("--from", dest="start", help="Start location (node id)")
     parser.add_argument("--to", dest="end", help="End location (node id)")
@@ -45,7 +64,7 @@ def main():
     parser.add_argument("--from-lon", type=float, help="Start longitude (alternative to --from)")
     parser.add_argument("--to-lat", type=float, help="End latitude (alternative to --to)")
     parser.add_argument("--to-lon", type=float, help="End longitude (alternative to --to)")
-    parser.add_argument("--algorithm", choices=["dijkstra", "astar"], default="dijkstra", help="Pathfinding algorithm")
+    parser.add_argument("--algorithm", choices=list(ALGORITHMS), default="dijkstra", help="Pathfinding algorithm")
     parser.add_argument("--avoid-hotspots", action="store_true", help="Avoid congestion hotspots if possible")
     parser.add_argument("--city", default="Berlin", help="City name (for HERE API)")
     parser.add_argument("--poll-interval", type=int, default=60, help="Traffic polling interval in seconds (default: 60)")
@@ -122,9 +141,9 @@ def main():
             path, cost = suggest_alternate_path(graph, start_node, end_node)
             if not path:
                 print("No alternate path found avoiding hotspots. Showing best available route.")
-                path, cost = getattr(graph, args.algorithm)(start_node, end_node)
+                path, cost = getattr(graph, ALGORITHMS[args.algorithm])(start_node, end_node)
         else:
-            path, cost = getattr(graph, args.algorithm)(start_node, end_node)
+            path, cost = getattr(graph, ALGORITHMS[args.algorithm])(start_node, end_node)
 
         print(f"Path: {' -> '.join(path)}")
         print(f"Total cost: {cost}")
@@ -150,7 +169,7 @@ def main():
             save_traffic_snapshot(data)
             print("Traffic snapshot recorded.")
         except ImportError:
-            print("Snapshot recording requires the 'historical_traffic' module.")
+            print("Snapshot recording requires the 'msgpack' package. Please install it with 'pip install msgpack'.")
 
     # Historical report (can be run standalone)
     if args.historical_report:
@@ -165,7 +184,7 @@ def main():
                 for edge, avg in averages.items():
                     print(f"  {edge}: {avg:.2f}")
         except ImportError:
-            print("Historical analysis requires the 'historical_traffic' module.")
+            print("Historical analysis requires the 'msgpack' package. Please install it with 'pip install msgpack'.")
         return
 
     # Alert management (standalone)
@@ -2,7 +2,8 @@
 congestion_map.py: Hotspot detection and alternate route logic.
 """
 from typing import List, Tuple, Any
-from .graph import Graph
+import numpy as np
+from .graph import Graph, float32_to_float
 
 CONGESTION_THRESHOLD = 7  # Example threshold for hotspot
 
@@ -10,30 +11,14 @@ def find_hotspots(graph: Graph) -> List[Tuple[Any, Any, float]]:
     """
     Return a list of edges (from, to, weight) that are considered congestion hotspots.
     """
-    hotspots = []
-    for from_node, neighbors in graph.edges.items():
-        for to_node, weight in neighbors:
-            if weight >= CONGESTION_THRESHOLD:
-                hotspots.append((from_node, to_node, weight))
-    return hotspots
+    names = graph.index_to_node
+    idx = np.where(graph.weights >= CONGESTION_THRESHOLD)[0]
+    return [(names[u], names[v], w) for u, v, w in zip(graph.src_of_edge[idx].tolist(), graph.indices[idx].tolist(), float32_to_float(graph.weights[idx]).tolist())]
 
 def suggest_alternate_path(graph: Graph, start: Any, end: Any) -> Tuple[List[Any], float]:
     """
     Suggest an alternate path avoiding congestion hotspots, if possible.
     """
-    # Temporarily remove hotspot edges
-    hotspots = find_hotspots(graph)
-    removed = []
-    for from_node, to_node, weight in hotspots:
-        neighbors = graph.edges[from_node]
-        for i, (n, w) in enumerate(neighbors):
-            if n == to_node and w == weight:
-                removed.append((from_node, to_node, weight))
-                neighbors.pop(i)
-                break
-    # Try to find a path
-    path, cost = graph.dijkstra(start, end)
-    # Restore removed edges
-    for from_node, to_node, weight in removed:
-        graph.edges[from_node].append((to_node, weight))
-    return path, cost 
\ No newline at end of file
+    # Skip hotspot edges during the search instead of mutating the shared graph,
+    # so this is safe to run while poll_traffic updates weights
+    return graph.dijkstra(start, end, blocked=graph.weights >= CONGESTION_THRESHOLD)
@@ -0,0 +1,35 @@
+"""
+fastjson.py: JSON encoding/decoding via orjson, falling back to the stdlib json module.
+"""
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+    import json
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serializes obj to UTF-8 encoded JSON bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    # Encode to one compact buffer (same layout as orjson) so callers issue a single write
+    return json.dumps(obj, separators=(",", ":"), default=_numpy_default).encode("utf-8")
+
+def _numpy_default(obj: Any) -> Any:
+    """
+    Stdlib fallback for the NumPy arrays and scalars orjson serializes natively.
+    """
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Deserializes JSON from bytes or str.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -2,78 +2,200 @@
 graph.py: Graph data structure and pathfinding algorithms (Dijkstra, A*)
 """
 from typing import Dict, List, Tuple, Any, Optional, Callable
-import heapq
 import math
+import numpy as np
+from .graph_numba import dijkstra_csr, a_star_csr, bidirectional_dijkstra_csr
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # nearest_node falls back to a linear scan
+    cKDTree = None
+
+_NO_BLOCKED_EDGES = np.zeros(0, dtype=np.bool_)
+
+def float32_to_float(values) -> np.ndarray:
+    """
+    Widens float32 values to float64 through their shortest decimal repr, so a stored 7.3
+    comes back as 7.3 rather than 7.300000190734863. Used wherever values leave the arrays.
+    """
+    return np.asarray(values, dtype=np.float32).astype(str).astype(np.float64)
 
 class Graph:
-    def __init__(self):
-        self.nodes = set()
-        self.edges: Dict[Any, List[Tuple[Any, float]]] = {}
-        self.positions: Dict[Any, Tuple[float, float]] = {}  # For heuristics (A*)
+    """
+    Directed, weighted graph stored in compressed-sparse-row (CSR) form.
+    Nodes are mapped to integer IDs; the out-edges of node u are the slice
+    indptr[u]:indptr[u + 1] of `indices` (target IDs) and `weights`.
+    """
+    def __init__(self, node_index: Optional[Dict[Any, int]] = None, indptr: Optional[np.ndarray] = None,
+                 indices: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None,
+                 positions_array: Optional[np.ndarray] = None, edge_index: Optional[Dict[Tuple[Any, Any], List[int]]] = None):
+        self.node_index: Dict[Any, int] = node_index if node_index is not None else {}
+        self.index_to_node: List[Any] = list(self.node_index)
+        n = len(self.index_to_node)
+        # Compact fixed dtypes: int32 IDs/offsets and float32 weights/positions (4 bytes each)
+        # keep the arrays the kernels stream through small and avoid per-dtype recompiles
+        self.indptr = np.ascontiguousarray(indptr if indptr is not None else np.zeros(n + 1), dtype=np.int32)
+        self.indices = np.ascontiguousarray(indices if indices is not None else np.zeros(0), dtype=np.int32)
+        self.weights: np.ndarray = np.ascontiguousarray(weights if weights is not None else np.zeros(0), dtype=np.float32)
+        self.positions_array = np.ascontiguousarray(positions_array if positions_array is not None else np.zeros((n, 2)), dtype=np.float32)  # For heuristics (A*)
+        # Source node ID of every edge, so per-edge filters need no walk over indptr
+        self.src_of_edge = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr))
+        # (from, to) -> CSR offsets of all edges between the pair (parallel edges included), for O(1) weight updates
+        if edge_index is None:
+            names = self.index_to_node
+            edge_index = {}
+            for e, (u, v) in enumerate(zip(self.src_of_edge.tolist(), self.indices.tolist())):
+                edge_index.setdefault((names[u], names[v]), []).append(e)
+        self.edge_index: Dict[Tuple[Any, Any], List[int]] = edge_index
+        # Reverse CSR (rindptr, rindices, redge) for backward searches, built on first use
+        self._reverse_csr: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        # Spatial index for nearest_node, built on first use
+        self.kdtree = None
+        self._projected_positions: Optional[np.ndarray] = None
+        self._lon_scale = 1.0
 
-    def add_node(self, node: Any, position: Optional[Tuple[float, float]] = None):
-        self.nodes.add(node)
-        if node not in self.edges:
-            self.edges[node] = []
-        if position:
-            self.positions[node] = position
+    @property
+    def nodes(self) -> List[Any]:
+        return self.index_to_node
 
-    def add_edge(self, from_node: Any, to_node: Any, weight: float):
-        self.edges.setdefault(from_node, []).append((to_node, weight))
-        self.edges.setdefault(to_node, [])  # Ensure to_node exists
+    @property
+    def edges(self) -> Dict[Any, List[Tuple[Any, float]]]:
+        """
+        Adjacency-list view (node -> [(neighbor, weight), ...]) built from the CSR arrays.
+        This is a snapshot; writes to it do not affect the graph.
+        """
+        names = self.index_to_node
+        indices = self.indices.tolist()
+        weights = float32_to_float(self.weights).tolist()
+        indptr = self.indptr.tolist()
+        return {
+            names[u]: [(names[v], w) for v, w in zip(indices[indptr[u]:indptr[u + 1]], weights[indptr[u]:indptr[u + 1]])]
+            for u in range(len(names))
+        }
 
-    def dijkstra(self, start: Any, end: Any) -> Tuple[List[Any], float]:
-        queue = [(0, start, [])]
-        visited = set()
-        while queue:
-            (cost, node, path) = heapq.heappop(queue)
-            if node in visited:
-                continue
-            visited.add(node)
-            path = path + [node]
-            if node == end:
-                return path, cost
-            for neighbor, weight in self.edges.get(node, []):
-                if neighbor not in visited:
-                    heapq.heappush(queue, (cost + weight, neighbor, path))
-        return [], float('inf')
+    @property
+    def positions(self) -> Dict[Any, Tuple[float, float]]:
+        """
+        Mapping node -> (lat, lon), built from positions_array.
+        """
+        return {node: tuple(pos) for node, pos in zip(self.index_to_node, float32_to_float(self.positions_array).tolist())}
+
+    def dijkstra(self, start: Any, end: Any, blocked: Optional[np.ndarray] = None) -> Tuple[List[Any], float]:
+        """
+        Shortest path from start to end. blocked is an optional boolean mask over edge
+        offsets (same length as weights); masked edges are ignored without touching the graph.
+        """
+        s = self.node_index.get(start)
+        t = self.node_index.get(end)
+        if s is None or t is None:
+            return [], float('inf')
+        if blocked is None:
+            blocked = _NO_BLOCKED_EDGES
+        dist, prev = dijkstra_csr(self.indptr, self.indices, self.weights, s, t, len(self.index_to_node), blocked)
+        return self._reconstruct_path(prev, s, t), float(float32_to_float(dist[t]))
 
     def a_star(self, start: Any, end: Any, heuristic: Optional[Callable[[Any, Any], float]] = None) -> Tuple[List[Any], float]:
+        """
+        A* search from start to end. heuristic(node, end) estimates the remaining cost; the
+        default is euclidean_heuristic, evaluated for all nodes at once.
+        """
+        s = self.node_index.get(start)
+        t = self.node_index.get(end)
+        if s is None or t is None:
+            return [], float('inf')
         if heuristic is None:
-            heuristic = self.euclidean_heuristic
-        queue = [(0 + heuristic(start, end), 0, start, [])]
-        visited = set()
-        while queue:
-            (est_total, cost, node, path) = heapq.heappop(queue)
-            if node in visited:
-                continue
-            visited.add(node)
-            path = path + [node]
-            if node == end:
-                return path, cost
-            for neighbor, weight in self.edges.get(node, []):
-                if neighbor not in visited:
-                    est = cost + weight + heuristic(neighbor, end)
-                    heapq.heappush(queue, (est, cost + weight, neighbor, path))
-        return [], float('inf')
+            # Euclidean distance of every node to the target in one vectorized pass
+            pos = self.positions_array
+            h = np.hypot(pos[:, 0] - pos[t, 0], pos[:, 1] - pos[t, 1])
+        else:
+            h = np.array([heuristic(node, end) for node in self.index_to_node], dtype=np.float32)
+        g_score, prev = a_star_csr(self.indptr, self.indices, self.weights, h, s, t, len(self.index_to_node))
+        return self._reconstruct_path(prev, s, t), float(float32_to_float(g_score[t]))
+
+    def reverse_csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the in-edge CSR arrays (rindptr, rindices, redge): the in-edges of node v are
+        rindptr[v]:rindptr[v + 1], with source IDs in rindices and forward edge offsets in redge.
+        Weights are looked up through redge, so weight updates need no rebuild.
+        """
+        if self._reverse_csr is None:
+            n = len(self.index_to_node)
+            redge = np.argsort(self.indices, kind="stable").astype(np.int32)
+            rindptr = np.zeros(n + 1, dtype=np.int32)
+            np.cumsum(np.bincount(self.indices, minlength=n), out=rindptr[1:])
+            self._reverse_csr = (rindptr, self.src_of_edge[redge], redge)
+        return self._reverse_csr
+
+    def bidirectional_dijkstra(self, start: Any, end: Any) -> Tuple[List[Any], float]:
+        """
+        Shortest path from start to end, searching forward from start and backward from end
+        until the two frontiers meet. Explores far fewer nodes than dijkstra on long routes.
+        """
+        s = self.node_index.get(start)
+        t = self.node_index.get(end)
+        if s is None or t is None:
+            return [], float('inf')
+        rindptr, rindices, redge = self.reverse_csr()
+        cost, meet, prev_f, next_b = bidirectional_dijkstra_csr(self.indptr, self.indices, self.weights, rindptr, rindices, redge, s, t, len(self.index_to_node))
+        if meet < 0:
+            return [], float('inf')
+        path = self._reconstruct_path(prev_f, s, meet)
+        node = meet
+        while node != t:
+            node = int(next_b[node])
+            path.append(self.index_to_node[node])
+        return path, float(float32_to_float(cost))
+
+    def _reconstruct_path(self, prev: np.ndarray, start: int, end: int) -> List[Any]:
+        """
+        Walks the predecessor array back from end to start and returns the node IDs (names) in order.
+        Returns an empty list if end was not reached.
+        """
+        if end != start and prev[end] < 0:
+            return []
+        path = [end]
+        while path[-1] != start:
+            path.append(int(prev[path[-1]]))
+        path.reverse()
+        return [self.index_to_node[i] for i in path]
 
     def euclidean_heuristic(self, node1: Any, node2: Any) -> float:
-        pos1 = self.positions.get(node1)
-        pos2 = self.positions.get(node2)
-        if pos1 and pos2:
-            return math.hypot(pos1[0] - pos2[0], pos1[1] - pos2[1])
+        """
+        Straight-line distance between two nodes' positions (0.0 if either is unknown).
+        Public so callers can pass it, or wrap it, as the heuristic of a_star.
+        """
+        i = self.node_index.get(node1)
+        j = self.node_index.get(node2)
+        if i is not None and j is not None:
+            pos1 = self.positions_array[i]
+            pos2 = self.positions_array[j]
+            return float(np.hypot(pos1[0] - pos2[0], pos1[1] - pos2[1]))
         return 0.0
 
+    def _project(self, lat, lon):
+        """
+        Local equirectangular projection: scales longitude by cos(mean latitude) so that
+        Euclidean distance approximates ground distance.
+        """
+        return lat, lon * self._lon_scale
+
     def nearest_node(self, lat: float, lon: float) -> Any:
         """
         Finds the node in the graph whose position is closest to the given (lat, lon).
         Returns the node ID.
         """
-        min_dist = float('inf')
-        nearest = None
-        for node, pos in self.positions.items():
-            dist = math.hypot(pos[0] - lat, pos[1] - lon)
-            if dist < min_dist:
-                min_dist = dist
-                nearest = node
-        return nearest 
\ No newline at end of file
+        if not self.index_to_node:
+            return None
+        if self._projected_positions is None:
+            pos = self.positions_array.astype(np.float64)
+            self._lon_scale = math.cos(math.radians(float(pos[:, 0].mean())))
+            self._projected_positions = np.column_stack(self._project(pos[:, 0], pos[:, 1]))
+            if cKDTree is not None:
+                self.kdtree = cKDTree(self._projected_positions)
+        x, y = self._project(lat, lon)
+        if self.kdtree is not None:
+            _, i = self.kdtree.query([x, y])
+        else:  # No scipy: brute-force scan over the projected positions
+            projected = self._projected_positions
+            i = np.argmin(np.hypot(projected[:, 0] - x, projected[:, 1] - y))
+        return self.index_to_node[int(i)]
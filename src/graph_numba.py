@@ -0,0 +1,202 @@
+"""
+graph_numba.py: Numba-compiled shortest-path kernels over the CSR arrays of Graph.
+Kernels are compiled with nogil=True so concurrent queries (e.g. --compare-algorithms)
+and the polling thread run in parallel instead of taking turns on the GIL.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # Kernels still run (slowly) as plain Python without numba
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# Indexed binary min-heap kept in parallel arrays (numba cannot compile heapq).
+# pos[node] is the node's slot in the heap, or -1 if it is not queued, so every node
+# appears at most once and a shorter distance is applied with decrease_key.
+@njit(cache=True, nogil=True)
+def _heap_swap(heap_key, heap_val, pos, i, j):
+    heap_key[i], heap_key[j] = heap_key[j], heap_key[i]
+    heap_val[i], heap_val[j] = heap_val[j], heap_val[i]
+    pos[heap_val[i]] = i
+    pos[heap_val[j]] = j
+
+
+@njit(cache=True, nogil=True)
+def heapify_up(heap_key, heap_val, pos, i):
+    while i > 0:
+        parent = (i - 1) // 2
+        if heap_key[parent] <= heap_key[i]:
+            break
+        _heap_swap(heap_key, heap_val, pos, parent, i)
+        i = parent
+
+
+@njit(cache=True, nogil=True)
+def heapify_down(heap_key, heap_val, pos, i, size):
+    while True:
+        left = 2 * i + 1
+        if left >= size:
+            break
+        child = left
+        if left + 1 < size and heap_key[left + 1] < heap_key[left]:
+            child = left + 1
+        if heap_key[i] <= heap_key[child]:
+            break
+        _heap_swap(heap_key, heap_val, pos, i, child)
+        i = child
+
+
+@njit(cache=True, nogil=True)
+def decrease_key(heap_key, heap_val, pos, size, key, node):
+    """
+    Queues node with priority key, or lowers its priority if it is already queued.
+    Returns the new heap size.
+    """
+    i = pos[node]
+    if i < 0:
+        i = size
+        heap_val[i] = node
+        pos[node] = i
+        size += 1
+    heap_key[i] = key
+    heapify_up(heap_key, heap_val, pos, i)
+    return size
+
+
+@njit(cache=True, nogil=True)
+def heap_pop(heap_key, heap_val, pos, size):
+    key = heap_key[0]
+    node = heap_val[0]
+    size -= 1
+    if size > 0:
+        heap_key[0] = heap_key[size]
+        heap_val[0] = heap_val[size]
+        pos[heap_val[0]] = 0
+        heapify_down(heap_key, heap_val, pos, 0, size)
+    pos[node] = -1
+    return key, node, size
+
+
+@njit(cache=True, nogil=True)
+def dijkstra_csr(indptr, indices, weights, s, t, n, blocked):
+    """
+    Single-pair Dijkstra from node ID s to t. Returns (dist, prev); prev[v] is -1 if v was not reached.
+    blocked is a boolean mask over edge offsets whose edges are skipped, or an empty array to allow all edges.
+    """
+    check_blocked = blocked.size > 0
+    dist = np.full(n, np.inf, np.float32)
+    prev = np.full(n, -1, np.int32)
+    heap_key = np.empty(n, np.float32)
+    heap_val = np.empty(n, np.int32)
+    pos = np.full(n, -1, np.int32)
+    dist[s] = 0.0
+    size = decrease_key(heap_key, heap_val, pos, 0, np.float32(0.0), s)
+    while size > 0:
+        cost, u, size = heap_pop(heap_key, heap_val, pos, size)
+        if u == t:
+            break
+        for e in range(indptr[u], indptr[u + 1]):
+            if check_blocked and blocked[e]:
+                continue
+            v = indices[e]
+            nd = cost + weights[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                prev[v] = u
+                size = decrease_key(heap_key, heap_val, pos, size, nd, v)
+    return dist, prev
+
+
+@njit(cache=True, nogil=True)
+def a_star_csr(indptr, indices, weights, h, s, t, n):
+    """
+    A* from node ID s to t with per-node heuristic values h (estimated cost to t).
+    Returns (g_score, prev); prev[v] is -1 if v was not reached.
+    """
+    g_score = np.full(n, np.inf, np.float32)
+    prev = np.full(n, -1, np.int32)
+    closed = np.zeros(n, np.bool_)
+    heap_key = np.empty(n, np.float32)
+    heap_val = np.empty(n, np.int32)
+    pos = np.full(n, -1, np.int32)
+    g_score[s] = 0.0
+    size = decrease_key(heap_key, heap_val, pos, 0, h[s], s)
+    while size > 0:
+        _, u, size = heap_pop(heap_key, heap_val, pos, size)
+        closed[u] = True
+        if u == t:
+            break
+        cost = g_score[u]
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            if closed[v]:
+                continue
+            tentative = cost + weights[e]
+            if tentative < g_score[v]:
+                g_score[v] = tentative
+                prev[v] = u
+                size = decrease_key(heap_key, heap_val, pos, size, tentative + h[v], v)
+    return g_score, prev
+
+
+@njit(cache=True, nogil=True)
+def bidirectional_dijkstra_csr(indptr, indices, weights, rindptr, rindices, redge, s, t, n):
+    """
+    Bidirectional Dijkstra from node ID s to t. The reverse graph is given as CSR arrays
+    (rindptr, rindices) whose edge k is forward edge redge[k], so weights are always read
+    from the live forward array.
+    Returns (cost, meet, prev_f, next_b): the shortest path is s ~> meet via prev_f followed
+    by meet ~> t via next_b; meet is -1 if t is unreachable.
+    """
+    dist_f = np.full(n, np.inf, np.float32)
+    dist_b = np.full(n, np.inf, np.float32)
+    prev_f = np.full(n, -1, np.int32)
+    next_b = np.full(n, -1, np.int32)
+    key_f = np.empty(n, np.float32)
+    val_f = np.empty(n, np.int32)
+    pos_f = np.full(n, -1, np.int32)
+    key_b = np.empty(n, np.float32)
+    val_b = np.empty(n, np.int32)
+    pos_b = np.full(n, -1, np.int32)
+    dist_f[s] = 0.0
+    dist_b[t] = 0.0
+    size_f = decrease_key(key_f, val_f, pos_f, 0, np.float32(0.0), s)
+    size_b = decrease_key(key_b, val_b, pos_b, 0, np.float32(0.0), t)
+    best = np.float32(np.inf)
+    meet = -1
+    if s == t:
+        best = np.float32(0.0)
+        meet = s
+    while size_f > 0 and size_b > 0:
+        # No path through unsettled nodes can beat best once the frontiers' radii sum past it
+        if key_f[0] + key_b[0] >= best:
+            break
+        if key_f[0] <= key_b[0]:
+            cost, u, size_f = heap_pop(key_f, val_f, pos_f, size_f)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                nd = cost + weights[e]
+                if nd < dist_f[v]:
+                    dist_f[v] = nd
+                    prev_f[v] = u
+                    size_f = decrease_key(key_f, val_f, pos_f, size_f, nd, v)
+                if nd + dist_b[v] < best:
+                    best = nd + dist_b[v]
+                    meet = v
+        else:
+            cost, u, size_b = heap_pop(key_b, val_b, pos_b, size_b)
+            for k in range(rindptr[u], rindptr[u + 1]):
+                v = rindices[k]
+                nd = cost + weights[redge[k]]
+                if nd < dist_b[v]:
+                    dist_b[v] = nd
+                    next_b[v] = u
+                    size_b = decrease_key(key_b, val_b, pos_b, size_b, nd, v)
+                if nd + dist_f[v] < best:
+                    best = nd + dist_f[v]
+                    meet = v
+    return best, meet, prev_f, next_b
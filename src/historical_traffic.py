@@ -1,21 +1,22 @@
-import json
 import os
+import sys
 from typing import List, Dict, Any
+import msgpack
+import numpy as np
+from . import fastjson
 
-HISTORICAL_DATA_FILE = "historical_traffic.json"
+HISTORICAL_DATA_FILE = "historical_traffic.msgpack"  # Concatenated msgpack documents, one per snapshot
+LEGACY_JSON_FILES = ("historical_traffic.jsonl", "historical_traffic.json")
+MIGRATED_SUFFIX = ".migrated"  # Appended to a legacy file's name once it has been converted
 
 def save_traffic_snapshot(data: List[Dict[str, Any]], filename: str = HISTORICAL_DATA_FILE):
     """
     Appends a traffic data snapshot to the historical data file.
+    Only the new snapshot is written; earlier ones are never re-read or rewritten.
+    msgpack documents are self-delimiting, so snapshots are simply concatenated.
     """
-    if os.path.exists(filename):
-        with open(filename, 'r') as f:
-            all_data = json.load(f)
-    else:
-        all_data = []
-    all_data.append(data)
-    with open(filename, 'w') as f:
-        json.dump(all_data, f)
+    with open(filename, 'ab') as f:
+        f.write(msgpack.packb(data))
 
 def load_historical_data(filename: str = HISTORICAL_DATA_FILE) -> List[List[Dict[str, Any]]]:
     """
@@ -23,20 +24,63 @@ def load_historical_data(filename: str = HISTORICAL_DATA_FILE) -> List[List[Dict
     """
     if not os.path.exists(filename):
         return []
-    with open(filename, 'r') as f:
-        return json.load(f)
+    with open(filename, 'rb') as f:
+        return list(msgpack.Unpacker(f))
+
+def convert_json_history(json_filename: str, filename: str = HISTORICAL_DATA_FILE) -> int:
+    """
+    One-off migration of a JSON history file (JSON Lines, or the older single JSON array)
+    into the msgpack history file. Snapshots are appended; returns how many were converted.
+    The source is renamed to <json_filename>.migrated afterwards, so a second run cannot
+    append the same snapshots again.
+    """
+    # Parse everything before touching the target, so a bad file appends nothing
+    packed = bytearray()
+    count = 0
+    with open(json_filename, 'rb') as src:
+        for line in src:
+            if not line.strip():
+                continue
+            doc = fastjson.loads(line)
+            # The older format stores every snapshot in one top-level array
+            snapshots = doc if doc and isinstance(doc[0], list) else [doc]
+            for snapshot in snapshots:
+                packed += msgpack.packb(snapshot)
+                count += 1
+    with open(filename, 'ab') as dst:
+        dst.write(packed)
+    os.replace(json_filename, json_filename + MIGRATED_SUFFIX)
+    return count
 
 def average_congestion_per_edge(historical_data: List[List[Dict[str, Any]]]) -> Dict[str, float]:
     """
     Computes the average congestion (weight) for each edge across all snapshots.
     Returns a dict: edge_key -> average_weight
     """
-    edge_sums = {}
-    edge_counts = {}
+    # Give each edge key a dense ID, then reduce all snapshots in one vectorized pass
+    edge_ids: Dict[str, int] = {}
+    idx_chunks = []
+    weight_chunks = []
     for snapshot in historical_data:
-        for segment in snapshot:
-            edge_key = f"{segment['from']}->{segment['to']}"
-            edge_sums[edge_key] = edge_sums.get(edge_key, 0) + segment['weight']
-            edge_counts[edge_key] = edge_counts.get(edge_key, 0) + 1
-    averages = {k: edge_sums[k] / edge_counts[k] for k in edge_sums}
-    return averages 
\ No newline at end of file
+        idx_chunks.append(np.fromiter((edge_ids.setdefault(f"{segment['from']}->{segment['to']}", len(edge_ids)) for segment in snapshot), dtype=np.int64, count=len(snapshot)))
+        weight_chunks.append(np.fromiter((segment['weight'] for segment in snapshot), dtype=np.float64, count=len(snapshot)))
+    if not edge_ids:
+        return {}
+    idx = np.concatenate(idx_chunks)
+    sums = np.bincount(idx, weights=np.concatenate(weight_chunks), minlength=len(edge_ids))
+    counts = np.bincount(idx, minlength=len(edge_ids))
+    averages = sums / np.maximum(counts, 1)
+    return dict(zip(edge_ids, averages.tolist()))
+
+
+if __name__ == "__main__":
+    # python -m src.historical_traffic [JSON_FILE ...]: migrate JSON history into HISTORICAL_DATA_FILE
+    json_filenames = sys.argv[1:] or [f for f in LEGACY_JSON_FILES if os.path.exists(f)]
+    if not json_filenames:
+        print("No JSON history to convert.")
+    for json_filename in json_filenames:
+        if os.path.exists(json_filename + MIGRATED_SUFFIX):
+            print(f"Skipping {json_filename}: it was already converted ({json_filename + MIGRATED_SUFFIX} exists).")
+            continue
+        count = convert_json_history(json_filename)
+        print(f"Converted {count} snapshots from {json_filename} to {HISTORICAL_DATA_FILE} (source renamed to {json_filename + MIGRATED_SUFFIX}).")
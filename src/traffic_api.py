@@ -2,64 +2,144 @@
 traffic_api.py: Integration with HERE API for traffic data, with mock fallback.
 """
 import requests
-from typing import Dict, Any, Tuple, List, Optional
+from typing import Dict, Any, Tuple, List, Optional, Iterable, Iterator
 from .graph import Graph
+from . import fastjson
+import numpy as np
 import os
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import ijson
+except ImportError:  # Streaming parse is optional; responses are decoded in one go without it
+    ijson = None
+
+try:
+    import aiohttp
+except ImportError:  # fetch_multiple_traffic_data falls back to a thread pool
+    aiohttp = None
+
 HERE_API_KEY = "YOUR_HERE_API_KEY"  # Replace with your actual HERE API key
 
-# Example: Fetch traffic data from HERE API (mocked for demo)
-def fetch_traffic_data(city: str = "Berlin", min_lat: float = None, min_lon: float = None, max_lat: float = None, max_lon: float = None) -> List[Dict[str, Any]]:
+# Shared session: keeps connections to the HERE endpoint alive across polls (no new TCP/TLS handshake per request)
+_session = requests.Session()
+_adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+_session.mount("https://", _adapter)
+REQUEST_TIMEOUT = 10  # seconds
+
+# Responses larger than this are parsed incrementally with ijson (if installed)
+STREAM_PARSE_MIN_BYTES = 4 * 1024 * 1024
+FLOW_ITEMS_PATH = "RWS.item.RW.item.FIS.item.FI.item"
+
+def _iter_flow_items(resp: requests.Response) -> Iterator[Dict[str, Any]]:
     """
-    Fetches traffic data from HERE API for a given city or bounding box.
-    If bounding box is provided, fetch for that area. Otherwise, use city name.
-    Returns a list of road segments with start/end coordinates and congestion level.
+    Yields the flow items (FI) of a HERE flow response.
+    Large responses are streamed so the whole document is never held in memory.
+    """
+    size = int(resp.headers.get("Content-Length") or 0)
+    if ijson is not None and size >= STREAM_PARSE_MIN_BYTES:
+        resp.raw.decode_content = True
+        yield from ijson.items(resp.raw, FLOW_ITEMS_PATH, use_float=True)
+        return
+    yield from _walk_flow_items(fastjson.loads(resp.content))
+
+def _walk_flow_items(data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the flow items (FI) of an already decoded HERE flow response.
+    """
+    for r in data.get("RWS", []):
+        for rw in r.get("RW", []):
+            for f in rw.get("FIS", []):
+                yield from f.get("FI", [])
+
+def _segment_from_flow_item(fi: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Converts one HERE flow item (a road segment) to a segment dict, or None if it has no usable shape.
+    """
+    shape = fi.get("SHP", [])
+    if not shape:
+        return None
+    # "lat,lon lat,lon ..." -> (K, 2) array, parsed by numpy's C float parser
+    coords = np.fromstring(shape[0].replace(",", " "), sep=" ")
+    if coords.size < 4 or coords.size % 2:
+        return None
+    coords = coords.reshape(-1, 2)
+    # float64 + tolist() keeps the exact Python floats the node IDs are derived from
+    from_pos = tuple(coords[0].tolist())
+    to_pos = tuple(coords[-1].tolist())
+    # Use "CF" (current flow) for congestion/weight
+    weight = fi.get("CF", [{}])[0].get("JF", 1.0)  # JF: Jam Factor (0-10)
+    return {
+        "from": str(from_pos),
+        "to": str(to_pos),
+        "weight": weight,
+        "from_pos": from_pos,
+        "to_pos": to_pos
+    }
+
+def _parse_segments(flow_items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Parses HERE flow items into road segments, dropping items without a usable shape.
+    """
+    return [segment for segment in map(_segment_from_flow_item, flow_items) if segment is not None]
+
+def _flow_url(min_lat: float = None, min_lon: float = None, max_lat: float = None, max_lon: float = None) -> Optional[str]:
+    """
+    Returns the HERE flow API URL for a bounding box, or None if no API key or bounding box is available.
     """
     api_key = os.environ.get("HERE_API_KEY", HERE_API_KEY)
     if api_key and api_key != "YOUR_HERE_API_KEY" and min_lat is not None and min_lon is not None and max_lat is not None and max_lon is not None:
-        # Use HERE Traffic API for real data
-        url = (
+        return (
             f"https://traffic.ls.hereapi.com/traffic/6.3/flow.json"
             f"?apiKey={api_key}"
             f"&bbox={min_lat},{min_lon};{max_lat},{max_lon}"
             f"&responseattributes=sh,fc"
         )
+    return None
+
+# Example: Fetch traffic data from HERE API (mocked for demo)
+def fetch_traffic_data(city: str = "Berlin", min_lat: float = None, min_lon: float = None, max_lat: float = None, max_lon: float = None) -> List[Dict[str, Any]]:
+    """
+    Fetches traffic data from HERE API for a given city or bounding box.
+    If bounding box is provided, fetch for that area. Otherwise, use city name.
+    Returns a list of road segments with start/end coordinates and congestion level.
+    """
+    url = _flow_url(min_lat, min_lon, max_lat, max_lon)
+    if url is not None:
+        # Use HERE Traffic API for real data
         try:
-            resp = requests.get(url)
-            resp.raise_for_status()
-            data = resp.json()
-            # Parse HERE API response to extract road segments
-            segments = []
-            for r in data.get("RWS", []):
-                for rw in r.get("RW", []):
-                    for f in rw.get("FIS", []):
-                        for fi in f.get("FI", []):
-                            # Each FI is a road segment
-                            shape = fi.get("SHP", [])
-                            if not shape:
-                                continue
-                            coords = [tuple(map(float, pt.split(","))) for pt in shape[0].split(" ")]
-                            if len(coords) < 2:
-                                continue
-                            from_pos = coords[0]
-                            to_pos = coords[-1]
-                            from_id = str(from_pos)
-                            to_id = str(to_pos)
-                            # Use "CF" (current flow) for congestion/weight
-                            weight = fi.get("CF", [{}])[0].get("JF", 1.0)  # JF: Jam Factor (0-10)
-                            segments.append({
-                                "from": from_id,
-                                "to": to_id,
-                                "weight": weight,
-                                "from_pos": from_pos,
-                                "to_pos": to_pos
-                            })
+            # Closing the streamed response hands its connection back to the pool
+            with _session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as resp:
+                resp.raise_for_status()
+                # Parse HERE API response to extract road segments
+                segments = _parse_segments(_iter_flow_items(resp))
             if segments:
                 return segments
         except Exception as e:
             print(f"HERE API error: {e}. Falling back to mock data.")
-    # Fallback: mock data
+    return mock_traffic_data()
+
+async def fetch_traffic_data_async(session: "aiohttp.ClientSession", city: str = "Berlin", min_lat: float = None, min_lon: float = None, max_lat: float = None, max_lon: float = None) -> List[Dict[str, Any]]:
+    """
+    Async counterpart of fetch_traffic_data that issues the request on a shared aiohttp session.
+    """
+    url = _flow_url(min_lat, min_lon, max_lat, max_lon)
+    if url is not None:
+        try:
+            async with session.get(url) as resp:
+                resp.raise_for_status()
+                segments = _parse_segments(_walk_flow_items(fastjson.loads(await resp.read())))
+            if segments:
+                return segments
+        except Exception as e:
+            print(f"HERE API error: {e}. Falling back to mock data.")
+    return mock_traffic_data()
+
+def mock_traffic_data() -> List[Dict[str, Any]]:
+    """
+    Small hardcoded city network used when the HERE API is unavailable.
+    """
     return [
         {"from": "A", "to": "B", "weight": 5, "from_pos": (52.5200, 13.4050), "to_pos": (52.5205, 13.4060)},
         {"from": "B", "to": "C", "weight": 3, "from_pos": (52.5205, 13.4060), "to_pos": (52.5210, 13.4070)},
@@ -73,11 +153,16 @@ def fetch_traffic_data(city: str = "Berlin", min_lat: float = None, min_lon: flo
         {"from": "B", "to": "E", "weight": 7, "from_pos": (52.5205, 13.4060), "to_pos": (52.5220, 13.4090)},
     ]
 
-def build_graph_from_traffic(data: List[Dict[str, Any]], mode: str = "car") -> Graph:
+def build_graph_from_traffic(data: Iterable[Dict[str, Any]], mode: str = "car") -> Graph:
     """
     Builds a Graph object from traffic data (HERE or mock), adjusting edge weights based on transport mode.
+    Nodes get integer IDs in order of first appearance and edges are laid out in CSR form.
+    data is consumed in a single pass, so any iterable of segments works.
     """
-    graph = Graph()
+    # First pass: assign integer IDs to nodes and collect edges
+    node_index: Dict[Any, int] = {}
+    positions = []
+    src, dst, weights, edge_keys = [], [], [], []
     for segment in data:
         weight = segment["weight"]
         if mode == "bike":
@@ -87,21 +172,56 @@ def build_graph_from_traffic(data: List[Dict[str, Any]], mode: str = "car") -> G
         elif mode == "public":
             # Public transport is less affected by congestion (mock: halve all weights)
             weight *= 0.5
-        graph.add_node(segment["from"], position=segment["from_pos"])
-        graph.add_node(segment["to"], position=segment["to_pos"])
-        graph.add_edge(segment["from"], segment["to"], weight)
-    return graph
+        for node, pos in ((segment["from"], segment["from_pos"]), (segment["to"], segment["to_pos"])):
+            if node not in node_index:
+                node_index[node] = len(node_index)
+                positions.append(pos)
+        src.append(node_index[segment["from"]])
+        dst.append(node_index[segment["to"]])
+        weights.append(weight)
+        edge_keys.append((segment["from"], segment["to"]))
+    n = len(node_index)
+    src = np.array(src, dtype=np.int32)
+    # Second pass: out-degrees -> row pointers
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    # Third pass: fill targets and weights grouped by source (stable keeps input order per node)
+    order = np.argsort(src, kind="stable")
+    indices = np.array(dst, dtype=np.int32)[order]
+    weights = np.array(weights, dtype=np.float32)[order]
+    positions_array = np.array(positions, dtype=np.float32).reshape(n, 2)
+    # Input segment k lands at CSR offset edge_pos[k]
+    edge_pos = np.empty(len(order), dtype=np.int64)
+    edge_pos[order] = np.arange(len(order))
+    edge_index: Dict[Any, List[int]] = {}
+    for key, e in zip(edge_keys, edge_pos.tolist()):
+        edge_index.setdefault(key, []).append(e)
+    return Graph(node_index, indptr, indices, weights, positions_array, edge_index)
+
+async def fetch_multiple_traffic_data_async(bboxes, city="Berlin"):
+    """
+    Fetches traffic data for multiple bounding boxes concurrently on one event loop.
+    All requests share a single aiohttp session (and its connection pool).
+    bboxes: list of (min_lat, min_lon, max_lat, max_lon)
+    Returns a list of lists of segments, in the order of bboxes.
+    """
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as session:
+        return list(await asyncio.gather(*[fetch_traffic_data_async(session, city, *bbox) for bbox in bboxes]))
 
 def fetch_multiple_traffic_data(bboxes, city="Berlin"):
     """
-    Fetches traffic data for multiple bounding boxes concurrently using ThreadPoolExecutor.
-    Demonstrates I/O-bound concurrency in RouteIQ.
+    Fetches traffic data for multiple bounding boxes concurrently.
+    Demonstrates I/O-bound concurrency in RouteIQ: uses asyncio + aiohttp when available,
+    otherwise a ThreadPoolExecutor. Must not be called from inside a running event loop;
+    async callers should await fetch_multiple_traffic_data_async instead.
     bboxes: list of (min_lat, min_lon, max_lat, max_lon)
     Returns a list of lists of segments.
     """
+    if aiohttp is not None:
+        return asyncio.run(fetch_multiple_traffic_data_async(bboxes, city))
     def fetch_one(bbox):
         min_lat, min_lon, max_lat, max_lon = bbox
         return fetch_traffic_data(city, min_lat, min_lon, max_lat, max_lon)
     with ThreadPoolExecutor() as executor:
         results = list(executor.map(fetch_one, bboxes))
-    return results 
\ No newline at end of file
+    return results
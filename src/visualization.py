@@ -1,41 +1,466 @@
 import folium
-from typing import List, Tuple, Any
+import gzip
+import json
+import logging
+import math
+import numpy as np
+import os
+import weakref
+from collections import OrderedDict
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+from typing import List, Tuple, Any, Optional, Union
+from . import fastjson
+from .graph import Graph
 
+try:
+    import brotli
+except ImportError:  # Only the gzip copy is written without brotli
+    brotli = None
 
-def plot_route_map(graph, route: List[Any], hotspots: List[Tuple[Any, Any, float]], filename: str = "route_map.html"):
+try:
+    from shapely.geometry import LineString
+except ImportError:  # The route line is drawn with every node
+    LineString = None
+
+log = logging.getLogger(__name__)
+
+# Graph -> OrderedDict of render arguments -> page bytes, see _cached_render_html
+_page_cache: "weakref.WeakKeyDictionary[Graph, OrderedDict]" = weakref.WeakKeyDictionary()
+
+COORD_DECIMALS = 5  # ~1 m; more digits only bloat the generated HTML
+SIMPLIFY_TOLERANCE = 10 ** -COORD_DECIMALS  # Degrees; only drops route points that are (nearly) collinear
+CULL_EDGE_THRESHOLD = 2000  # Above this many edges, only edges near the route are drawn
+CULL_MARGIN = 0.2  # Fraction of the route's extent added on each side of its bounding box
+CULL_MIN_MARGIN = 0.005  # Degrees; keeps some context around very short routes
+GZIP_LEVEL = 6  # Close to level 9's ratio at a fraction of the time
+BROTLI_QUALITY = 11
+PAGE_CACHE_SIZE = 32  # Rendered pages kept per graph
+HOTSPOT_CLUSTER_THRESHOLD = 50  # Above this many hotspots, show clustered markers instead of lines
+# Builds each clustered hotspot marker in the browser from a [lat, lon, radius, weight] row
+HOTSPOT_MARKER_CALLBACK = """
+function (row) {
+    return L.circleMarker(new L.LatLng(row[0], row[1]), {radius: row[2], color: 'red', fill: true})
+        .bindTooltip('Hotspot (weight: ' + row[3] + ')');
+}
+"""
+
+
+def _template_json_dumps(obj: Any, **kwargs) -> str:
+    """
+    JSON encoder behind folium's |tojson template filter: every coordinate list and option
+    dict in the page goes through it on save. Uses orjson where possible, falling back to
+    the stdlib for values orjson rejects (e.g. non-string dict keys).
+    """
+    try:
+        return fastjson.dumps(obj).decode("utf-8")
+    except TypeError:
+        return json.dumps(obj, **kwargs)
+
+
+# All folium templates share one Jinja environment, so this covers every element on the map
+folium.Map._template.environment.policies["json.dumps_function"] = _template_json_dumps
+
+
+class _RawScript(folium.Element):
+    """
+    Script text emitted verbatim. Elements built from a template string (as MacroElement
+    does with its rendered output) compile that whole string, data included, as Jinja.
+    """
+    _template = Template("{{ this.code }}")
+
+    def __init__(self, code: str):
+        super().__init__()
+        self.code = code
+
+
+class _LineBatch(folium.MacroElement):
+    """
+    Draws a list of line segments on its parent layer as one Leaflet polyline, from a single
+    embedded coordinates array. Needs no per-segment folium objects or template passes.
+    """
+    def __init__(self, segments: Union[List[List[Tuple[float, float]]], np.ndarray], **options):
+        super().__init__()
+        self._name = "LineBatch"
+        self.segments = segments
+        self.options = options
+
+    def render(self, **kwargs):
+        # Added during render so the script lands right after the parent layer's own script
+        code = "L.polyline({}, {}).addTo({});".format(
+            fastjson.dumps(self.segments).decode("utf-8"), fastjson.dumps(self.options).decode("utf-8"),
+            self._parent.get_name())
+        self.get_root().script.add_child(_RawScript(code), name=self.get_name())
+
+
+class _SidecarLines(folium.MacroElement):
+    """
+    Loads a GeoJSON file written by write_edges_sidecar into its parent layer after the
+    page has loaded, so the page itself carries no base-network geometry.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            fetch({{ this.url|tojson }})
+                .then(response => response.json())
+                .then(data => L.geoJSON(data, {style: feature => feature.properties}).addTo({{ this._parent.get_name() }}));
+        {% endmacro %}
+    """)
+
+    def __init__(self, url: str):
+        super().__init__()
+        self._name = "SidecarLines"
+        self.url = url
+
+
+def _write_precompressed(filename: str, data: bytes) -> None:
+    """
+    Writes filename.gz (and filename.br if brotli is installed) next to the saved map,
+    for web servers that serve precompressed files as-is (e.g. nginx gzip_static).
+    """
+    with open(filename + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+    if brotli is not None:
+        with open(filename + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=BROTLI_QUALITY))
+
+
+def _line_feature(lines: List[List[Tuple[float, float]]], name: str, color: str, weight: int,
+                  opacity: float, **properties) -> dict:
+    """
+    GeoJSON Feature with one MultiLineString geometry from lists of (lat, lon) points.
+    GeoJSON expects [lon, lat] order; the style (weight is the line width) and any extra
+    properties travel in the feature's properties.
+    """
+    return {
+        "type": "Feature",
+        "geometry": {"type": "MultiLineString", "coordinates": [[[lon, lat] for lat, lon in line] for line in lines]},
+        "properties": {"name": name, "color": color, "weight": weight, "opacity": opacity, **properties},
+    }
+
+
+def _style_from_properties(feature: dict) -> dict:
+    props = feature["properties"]
+    return {"color": props["color"], "weight": props["weight"], "opacity": props["opacity"]}
+
+
+def _lines_layer(features: List[dict], name: str, tooltip: Optional[folium.GeoJsonTooltip] = None) -> folium.GeoJson:
+    """
+    One Leaflet GeoJSON layer holding all the given line features.
+    """
+    return folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name=name,
+        style_function=_style_from_properties,
+        tooltip=tooltip,
+    )
+
+
+def _round_coord(pos: Tuple[float, float]) -> Tuple[float, float]:
+    return (round(pos[0], COORD_DECIMALS), round(pos[1], COORD_DECIMALS))
+
+
+def _simplify_line(coords: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """
+    Douglas-Peucker simplification of a polyline, removing points within SIMPLIFY_TOLERANCE of
+    the simplified line (e.g. intermediate nodes on a straight street). Needs shapely.
+    """
+    if LineString is None or len(coords) < 3:
+        return coords
+    return [_round_coord(p) for p in LineString(coords).simplify(SIMPLIFY_TOLERANCE, preserve_topology=False).coords]
+
+
+def _route_bbox(route_coords: List[Tuple[float, float]]) -> Tuple[float, float, float, float]:
+    """
+    Returns (min_lat, min_lon, max_lat, max_lon) around the route, inflated by CULL_MARGIN.
+    """
+    lats = [c[0] for c in route_coords]
+    lons = [c[1] for c in route_coords]
+    lat_pad = max((max(lats) - min(lats)) * CULL_MARGIN, CULL_MIN_MARGIN)
+    lon_pad = max((max(lons) - min(lons)) * CULL_MARGIN, CULL_MIN_MARGIN)
+    return (min(lats) - lat_pad, min(lons) - lon_pad, max(lats) + lat_pad, max(lons) + lon_pad)
+
+
+def _hotspot_radius(weight: float) -> float:
+    """
+    Marker radius in pixels, growing logarithmically with the jam factor (0-10).
+    """
+    return max(7, 7 + 10 * math.log2(weight / 10 + 1))
+
+
+def _route_and_hotspot_pairs(route: Tuple[Any, ...], hotspots: Tuple[Tuple[Any, Any, float], ...]) -> Tuple[set, dict]:
+    """
+    Returns (route pairs, hotspot pair -> weight). A->B and B->A render as the same line, so
+    pairs are keyed without direction, and a hotspot reported both ways keeps the larger weight.
+    """
+    route_edge_set = {(u, v) if u < v else (v, u) for u, v in zip(route, route[1:])}
+    hotspot_weight = {}
+    for u, v, weight in hotspots:
+        key = (u, v) if u < v else (v, u)
+        hotspot_weight[key] = max(weight, hotspot_weight.get(key, weight))
+    return route_edge_set, hotspot_weight
+
+
+def _classify_edges(graph, route: Tuple[Any, ...], hotspots: Tuple[Tuple[Any, Any, float], ...],
+                    full_graph: bool) -> Tuple[list, list, list]:
+    """
+    Returns (route_coords, base_segments, hotspot_segments) for the map, walking graph.edges.
+    Segments are [(lat, lon), (lat, lon)] pairs; hotspot segments come with their weight.
+    Fallback for graphs without CSR arrays; see _classify_edges_csr.
+    """
+    # Get all node positions, rounded once so every polyline and marker emits short coordinates
+    positions = {node: _round_coord(pos) for node, pos in graph.positions.items()}
+    # Bound-method aliases: the loops below probe positions once or twice per edge
+    pos_has = positions.__contains__
+    pos_get = positions.__getitem__
+    route_coords = [pos_get(node) for node in route if pos_has(node)]
+
+    # Spatial culling: on big graphs skip edges with both endpoints outside the route's bounding box
+    edges = graph.edges
+    bbox = None
+    if not full_graph and route_coords and sum(len(neighbors) for neighbors in edges.values()) > CULL_EDGE_THRESHOLD:
+        bbox = _route_bbox(route_coords)
+
+    def in_bbox(pos: Tuple[float, float]) -> bool:
+        return bbox[0] <= pos[0] <= bbox[2] and bbox[1] <= pos[1] <= bbox[3]
+
+    # One pass over the edges sorts every node pair into the route (already drawn by the
+    # route line), a hotspot, or the gray base network, so no pair is drawn twice.
+    route_edge_set, hotspot_weight = _route_and_hotspot_pairs(route, hotspots)
+    all_segments = []
+    add_segment = all_segments.append
+    hotspot_segments = []
+    add_hotspot = hotspot_segments.append
+    seen = set()
+    mark_seen = seen.add
+    edge_items = edges.items()
+    for from_node, neighbors in edge_items:
+        if not pos_has(from_node):
+            continue
+        from_pos = pos_get(from_node)
+        for to_node, _ in neighbors:
+            key = (from_node, to_node) if from_node < to_node else (to_node, from_node)
+            if key in seen:
+                continue
+            mark_seen(key)
+            if not pos_has(to_node) or key in route_edge_set:
+                continue
+            to_pos = pos_get(to_node)
+            if key in hotspot_weight:
+                add_hotspot(([from_pos, to_pos], hotspot_weight[key]))
+            elif bbox is None or in_bbox(from_pos) or in_bbox(to_pos):
+                add_segment([from_pos, to_pos])
+
+    return route_coords, all_segments, hotspot_segments
+
+
+def _classify_edges_csr(graph, route: Tuple[Any, ...], hotspots: Tuple[Tuple[Any, Any, float], ...],
+                        full_graph: bool) -> Tuple[list, list, list]:
+    """
+    Same result as _classify_edges, computed with array operations over the graph's CSR
+    arrays (src_of_edge/indices as edge endpoints, positions_array for coordinates).
+    base_segments is an (E, 2, 2) array rather than a list.
+    """
+    node_index = graph.node_index
+    n = len(graph.index_to_node)
+    pos = np.round(graph.positions_array.astype(np.float64), COORD_DECIMALS)
+    route_ids = np.array([node_index[node] for node in route if node in node_index], dtype=np.int64)
+    route_coords = [tuple(p) for p in pos[route_ids].tolist()]
+
+    # One undirected key per edge; keep each node pair's first edge, in CSR order
+    u = graph.src_of_edge.astype(np.int64)
+    v = graph.indices.astype(np.int64)
+    keys = np.minimum(u, v) * n + np.maximum(u, v)
+    _, first = np.unique(keys, return_index=True)
+    first.sort()
+    u, v, keys = u[first], v[first], keys[first]
+
+    # Pairs on the route are drawn by the route line
+    route_keys = np.minimum(route_ids[:-1], route_ids[1:]) * n + np.maximum(route_ids[:-1], route_ids[1:])
+    off_route = ~np.isin(keys, route_keys)
+    u, v, keys = u[off_route], v[off_route], keys[off_route]
+
+    # Hotspot pairs keep the larger weight of their two directions
+    hot = [(node_index[a], node_index[b], w) for a, b, w in hotspots if a in node_index and b in node_index]
+    hot_keys = np.array([min(a, b) * n + max(a, b) for a, b, _ in hot], dtype=np.int64)
+    hot_unique, hot_inverse = np.unique(hot_keys, return_inverse=True)
+    hot_weight = np.full(len(hot_unique), -np.inf)
+    np.maximum.at(hot_weight, hot_inverse, np.array([w for _, _, w in hot], dtype=np.float64))
+    slot = np.minimum(np.searchsorted(hot_unique, keys), max(len(hot_unique) - 1, 0))
+    is_hot = hot_unique[slot] == keys if len(hot_unique) else np.zeros(len(keys), dtype=bool)
+    hotspot_segments = list(zip(pos[np.stack([u[is_hot], v[is_hot]], axis=1)].tolist(), hot_weight[slot[is_hot]].tolist()))
+
+    # Spatial culling: on big graphs skip edges with both endpoints outside the route's bounding box
+    base = ~is_hot
+    if not full_graph and route_coords and len(graph.indices) > CULL_EDGE_THRESHOLD:
+        min_lat, min_lon, max_lat, max_lon = _route_bbox(route_coords)
+        inside = (pos[:, 0] >= min_lat) & (pos[:, 0] <= max_lat) & (pos[:, 1] >= min_lon) & (pos[:, 1] <= max_lon)
+        base &= inside[u] | inside[v]
+    # Left as an (E, 2, 2) array: fastjson serializes it directly, without E nested Python lists
+    all_segments = pos[np.stack([u[base], v[base]], axis=1)]
+    return route_coords, all_segments, hotspot_segments
+
+
+def _classify(graph, route: Tuple[Any, ...], hotspots: Tuple[Tuple[Any, Any, float], ...],
+              full_graph: bool) -> Tuple[Any, Any, list]:
+    if hasattr(graph, "indptr") and hasattr(graph, "positions_array"):
+        return _classify_edges_csr(graph, route, hotspots, full_graph)
+    return _classify_edges(graph, route, hotspots, full_graph)
+
+
+def _route_and_hotspots(graph, route: Tuple[Any, ...],
+                        hotspots: Tuple[Tuple[Any, Any, float], ...]) -> Tuple[list, list]:
+    """
+    Returns (route_coords, hotspot_segments) by looking up only the nodes involved, for maps
+    that draw no base network and so need no pass over the graph's edges.
+    """
+    if hasattr(graph, "positions_array"):
+        node_index = graph.node_index
+        positions_array = graph.positions_array
+
+        def position(node):
+            i = node_index.get(node)
+            return None if i is None else _round_coord(positions_array[i].tolist())
+    else:
+        positions = graph.positions
+
+        def position(node):
+            pos = positions.get(node)
+            return None if pos is None else _round_coord(pos)
+
+    route_coords = [pos for pos in map(position, route) if pos is not None]
+    route_edge_set, hotspot_weight = _route_and_hotspot_pairs(route, hotspots)
+    hotspot_segments = []
+    for (u, v), weight in hotspot_weight.items():
+        from_pos, to_pos = position(u), position(v)
+        if from_pos is not None and to_pos is not None and (u, v) not in route_edge_set:
+            hotspot_segments.append(([from_pos, to_pos], weight))
+    return route_coords, hotspot_segments
+
+
+def write_edges_sidecar(graph, filename: str = "route_map_edges.geojson") -> None:
+    """
+    Writes the graph's whole road network as a GeoJSON file for plot_route_map(edges_sidecar=...).
+    The network does not change between routes on the same graph, so callers write it once
+    and regenerate it only when the graph itself changes.
+    """
+    _, segments, _ = _classify(graph, (), (), True)
+    if isinstance(segments, np.ndarray):
+        coordinates = np.ascontiguousarray(segments[:, :, ::-1])  # GeoJSON wants [lon, lat]
+        feature = _line_feature([], 'Road network', 'gray', 2, 0.5)
+        feature["geometry"]["coordinates"] = coordinates
+    else:
+        feature = _line_feature(segments, 'Road network', 'gray', 2, 0.5)
+    with open(filename, "wb") as f:
+        f.write(fastjson.dumps({"type": "FeatureCollection", "features": [feature]}))
+
+
+def plot_route_map(graph, route: List[Any], hotspots: List[Tuple[Any, Any, float]], filename: str = "route_map.html",
+                   full_graph: bool = False, edges_sidecar: Optional[str] = None, draw_base_edges: bool = True):
     """
     Plots the graph, highlights the route, and marks congestion hotspots on a Folium map.
+    On large graphs only edges with an endpoint near the route are drawn; pass
+    full_graph=True to draw every edge.
+    edges_sidecar is the URL (relative to the page) of a file from write_edges_sidecar; the
+    page then fetches the road network from it instead of embedding it. Browsers only allow
+    that fetch when the map is served over HTTP, not opened as a local file.
+    draw_base_edges=False leaves out the road network entirely, skipping the pass over all
+    edges when only the route and hotspots are of interest.
     """
-    # Get all node positions
-    positions = graph.positions
-    # Center map on the first node in the route or arbitrary node
-    if route and route[0] in positions:
-        center = positions[route[0]]
-    elif positions:
-        center = next(iter(positions.values()))
+    html = _cached_render_html(graph, tuple(route), tuple(map(tuple, hotspots)), full_graph, edges_sidecar, draw_base_edges)
+    # Re-plotting an unchanged map returns the cached page; leave the files (and their mtimes) alone then
+    if not _file_has_content(filename, html):
+        with open(filename, "wb") as f:
+            f.write(html)
+        _write_precompressed(filename, html)
+    log.info("Map saved to %s. Open it in your browser to view.", filename)
+
+
+def _file_has_content(filename: str, data: bytes) -> bool:
+    try:
+        if os.path.getsize(filename) != len(data):
+            return False
+        with open(filename, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def _cached_render_html(graph, *args) -> bytes:
+    """
+    _render_html with a per-graph LRU cache of up to PAGE_CACHE_SIZE pages. Only CSR Graph
+    instances are cached: their nodes, edges and positions are fixed at construction (the
+    hotspots argument carries the current weights), whereas other graphs may be edited
+    between calls. The graph is held weakly, so its pages are dropped along with it.
+    """
+    if not isinstance(graph, Graph):
+        return _render_html(graph, *args)
+    pages = _page_cache.get(graph)
+    if pages is None:
+        pages = _page_cache[graph] = OrderedDict()
+    html = pages.get(args)
+    if html is None:
+        html = pages[args] = _render_html(graph, *args)
+        if len(pages) > PAGE_CACHE_SIZE:
+            pages.popitem(last=False)
+    else:
+        pages.move_to_end(args)
+    return html
+
+
+def _render_html(graph, route: Tuple[Any, ...], hotspots: Tuple[Tuple[Any, Any, float], ...], full_graph: bool,
+                 edges_sidecar: Optional[str], draw_base_edges: bool) -> bytes:
+    """
+    Builds the map page for plot_route_map.
+    """
+    if draw_base_edges and edges_sidecar is None:
+        route_coords, all_segments, hotspot_segments = _classify(graph, route, hotspots, full_graph)
+    else:  # No embedded base network, so no need to walk the edges
+        route_coords, hotspot_segments = _route_and_hotspots(graph, route, hotspots)
+        all_segments = []
+    # Center map on the route's start, or an arbitrary drawn point
+    if route_coords:
+        center = route_coords[0]
+    elif len(all_segments):
+        center = tuple(all_segments[0][0])
+    elif hotspot_segments:
+        center = hotspot_segments[0][0][0]
     else:
         center = (0, 0)
-    m = folium.Map(location=center, zoom_start=14)
-
-    # Draw all edges
-    for from_node, neighbors in graph.edges.items():
-        for to_node, weight in neighbors:
-            if from_node in positions and to_node in positions:
-                folium.PolyLine([positions[from_node], positions[to_node]], color='gray', weight=2, opacity=0.5).add_to(m)
-
-    # Highlight the route
-    if route:
-        route_coords = [positions[node] for node in route if node in positions]
-        folium.PolyLine(route_coords, color='blue', weight=5, opacity=0.8, tooltip='Route').add_to(m)
-        # Mark start and end
-        if route_coords:
-            folium.Marker(route_coords[0], popup='Start', icon=folium.Icon(color='green')).add_to(m)
-            folium.Marker(route_coords[-1], popup='End', icon=folium.Icon(color='red')).add_to(m)
+    # Canvas renderer: polylines and circle markers are painted on one <canvas> instead of one SVG node each
+    m = folium.Map(location=center, zoom_start=14, prefer_canvas=True)
+
+    # The base network (toggleable on its own) is the bulk of the page: its segments go out as
+    # one raw coordinates array, or are left to the sidecar file. The route and the hotspots are
+    # small GeoJSON layers on top.
+    if draw_base_edges and edges_sidecar is not None:
+        edge_layer = folium.FeatureGroup(name='Road network').add_to(m)
+        _SidecarLines(edges_sidecar).add_to(edge_layer)
+    elif len(all_segments):
+        edge_layer = folium.FeatureGroup(name='Road network').add_to(m)
+        _LineBatch(all_segments, color='gray', weight=2, opacity=0.5).add_to(edge_layer)
+
+    if route_coords:
+        route_feature = _line_feature([_simplify_line(route_coords)], 'Route', 'blue', 5, 0.8)
+        _lines_layer([route_feature], 'Route', folium.GeoJsonTooltip(fields=["name"], labels=False)).add_to(m)
 
     # Mark congestion hotspots
-    for from_node, to_node, weight in hotspots:
-        if from_node in positions and to_node in positions:
-            folium.PolyLine([positions[from_node], positions[to_node]], color='red', weight=4, opacity=0.7, tooltip=f'Hotspot (weight: {weight})').add_to(m)
+    if len(hotspot_segments) > HOTSPOT_CLUSTER_THRESHOLD:
+        # Many hotspots: one marker per hotspot midpoint, merged into clusters that split on zoom.
+        # Markers are created client-side from a plain data array rather than one folium object each.
+        rows = [[*_round_coord(((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)), round(_hotspot_radius(weight), 1), round(weight, 2)]
+                for (a, b), weight in hotspot_segments]
+        FastMarkerCluster(rows, callback=HOTSPOT_MARKER_CALLBACK, name='Congestion hotspots').add_to(m)
+    elif hotspot_segments:
+        # Few hotspots: one feature each, so the tooltip can show its weight like the clustered markers do
+        hotspot_features = [_line_feature([segment], 'Congestion hotspot', 'red', 4, 0.7, hotspot_weight=round(weight, 2))
+                            for segment, weight in hotspot_segments]
+        tooltip = folium.GeoJsonTooltip(fields=["hotspot_weight"], aliases=["Hotspot weight"])
+        _lines_layer(hotspot_features, 'Congestion hotspots', tooltip).add_to(m)
+
+    # Mark start and end
+    if route_coords:
+        folium.Marker(route_coords[0], popup='Start', icon=folium.Icon(color='green')).add_to(m)
+        folium.Marker(route_coords[-1], popup='End', icon=folium.Icon(color='red')).add_to(m)
 
-    m.save(filename)
-    print(f"Map saved to {filename}. Open it in your browser to view.") 
\ No newline at end of file
+    folium.LayerControl().add_to(m)  # Lets the road network and hotspot layers be toggled
+    return m.get_root().render().encode("utf-8") 
\ No newline at end of file